@@ -0,0 +1,299 @@
+# app/admission.py
+"""
+Cost-aware admission control for the list endpoints.
+
+Every list request gets a cost estimate from its size, page, sort column,
+filters and projected fields. The cost is charged against a per-client token
+bucket, and requests above HEAVY_COST additionally need one of a small number
+of global "heavy query" slots, so a few large listings cannot take over the
+threadpool and starve cheap GET /flights/{id} calls. Rejected requests get
+429 with a Retry-After header.
+
+Off by default (FLIGHTS_ADMISSION=1 turns it on). Defaults once enabled:
+60-token bucket refilled at 6 tokens/s per client (a plain first page costs
+1.5, a size=200 listing sorted by an unindexed column about 30), 4 heavy
+slots for queries costing 10 or more.
+
+Buckets are keyed by the peer address unless FLIGHTS_ADMISSION_CLIENT_HEADER
+names a header set by a trusted gateway (e.g. the authenticated principal).
+Never point it at a header clients can choose themselves, and note that
+behind a reverse proxy without such a header every caller shares the proxy's
+bucket.
+"""
+
+import asyncio
+import math
+import os
+import re
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from fastapi import HTTPException, Request
+
+from .repositories import ALLOWED_SELECT_COLUMNS
+
+ADMISSION_ENABLED = os.environ.get("FLIGHTS_ADMISSION", "0") == "1"
+BUCKET_CAPACITY = float(os.environ.get("FLIGHTS_ADMISSION_BUCKET", "60"))
+BUCKET_REFILL_PER_SEC = float(os.environ.get("FLIGHTS_ADMISSION_REFILL", "6"))
+HEAVY_COST = float(os.environ.get("FLIGHTS_ADMISSION_HEAVY_COST", "10"))
+HEAVY_CONCURRENCY = int(os.environ.get("FLIGHTS_ADMISSION_HEAVY_SLOTS", "4"))
+QUEUE_TIMEOUT_SEC = float(os.environ.get("FLIGHTS_ADMISSION_QUEUE_TIMEOUT", "0.5"))
+# base cost of ranking every FTS match before the first page can be returned
+SEARCH_RANK_COST = float(os.environ.get("FLIGHTS_ADMISSION_SEARCH_COST", "3"))
+MAX_TRACKED_CLIENTS = 10000
+
+# columns SQLite can order by without a sort step
+INDEXED_SORT_COLUMNS = {"flight_id"}
+EQUALITY_FILTERS = {"origin", "destination", "status", "flight_number"}
+
+# header carrying a gateway-verified client identity; empty = peer address
+CLIENT_ID_HEADER = os.environ.get("FLIGHTS_ADMISSION_CLIENT_HEADER", "")
+
+
+def estimate_cost(
+    page: int,
+    size: int,
+    sort_by: str,
+    filters: Dict[str, Any],
+    fields: Optional[str],
+) -> float:
+    """Relative cost of a list query; a default first page costs about 1.5."""
+    cost = size / 20
+    # OFFSET pagination still walks every skipped row
+    cost += (page - 1) * size / 500
+    if sort_by not in INDEXED_SORT_COLUMNS:
+        cost *= 2
+    if not EQUALITY_FILTERS & set(filters):
+        cost *= 1.5
+    width = len(ALLOWED_SELECT_COLUMNS)
+    if fields:
+        width = min(width, len([f for f in fields.split(",") if f.strip()]) or width)
+    cost *= 0.5 + 0.5 * width / len(ALLOWED_SELECT_COLUMNS)
+    return cost
+
+
+def estimate_search_cost(q: str, size: int, fields: Optional[str]) -> float:
+    """
+    Relative cost of GET /flights/search. Every match is ranked before the
+    page is cut, and a short prefix matches many rows: "SP10" at size=20
+    costs 4, a one-letter prefix 13 (heavy).
+    """
+    terms = re.findall(r"\w+", q or "") or [""]
+    shortest = max(1, min(4, min(len(t) for t in terms)))
+    cost = size / 20 + SEARCH_RANK_COST * 4 / shortest
+    width = len(ALLOWED_SELECT_COLUMNS)
+    if fields:
+        width = min(width, len([f for f in fields.split(",") if f.strip()]) or width)
+    cost *= 0.5 + 0.5 * width / len(ALLOWED_SELECT_COLUMNS)
+    return cost
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, capacity: float, now: float):
+        self.tokens = capacity
+        self.updated = now
+
+    def refill(self, capacity: float, rate: float, now: float):
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        enabled: bool = ADMISSION_ENABLED,
+        capacity: float = BUCKET_CAPACITY,
+        refill_per_sec: float = BUCKET_REFILL_PER_SEC,
+        heavy_cost: float = HEAVY_COST,
+        heavy_concurrency: int = HEAVY_CONCURRENCY,
+        queue_timeout: float = QUEUE_TIMEOUT_SEC,
+        client_header: str = CLIENT_ID_HEADER,
+    ):
+        self.enabled = enabled
+        self.client_header = client_header
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        self.heavy_cost = heavy_cost
+        self.heavy_concurrency = heavy_concurrency
+        self.queue_timeout = queue_timeout
+
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, TokenBucket] = {}
+        # awaited on the event loop, so a queued heavy query never parks
+        # a threadpool worker that GET /flights/{id} needs
+        self._heavy_slots = asyncio.Semaphore(heavy_concurrency)
+        self._metrics = {
+            "admitted": 0,
+            "admitted_heavy": 0,
+            "rejected_rate_limited": 0,
+            "rejected_overloaded": 0,
+            "queued": 0,
+            "heavy_in_flight": 0,
+        }
+
+    # -----------------------
+    #     TOKEN BUCKETS
+    # -----------------------
+
+    def _take_tokens(self, client_id: str, cost: float) -> Optional[float]:
+        """Charge `cost` to the client. Returns seconds to wait if it can't pay."""
+        # a single query may never cost more than a full bucket
+        cost = min(cost, self.capacity)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(client_id)
+            if bucket is None:
+                if len(self._buckets) >= MAX_TRACKED_CLIENTS:
+                    self._prune(now)
+                bucket = self._buckets[client_id] = TokenBucket(self.capacity, now)
+            bucket.refill(self.capacity, self.refill_per_sec, now)
+            if bucket.tokens < cost:
+                return (cost - bucket.tokens) / self.refill_per_sec
+            bucket.tokens -= cost
+            return None
+
+    def _refund_tokens(self, client_id: str, cost: float):
+        """Give back a charge for a request that was not served after all."""
+        with self._lock:
+            bucket = self._buckets.get(client_id)
+            if bucket is not None:
+                bucket.tokens = min(self.capacity, bucket.tokens + min(cost, self.capacity))
+
+    def _prune(self, now: float):
+        # buckets that have refilled completely carry no state worth keeping
+        for client_id, bucket in list(self._buckets.items()):
+            bucket.refill(self.capacity, self.refill_per_sec, now)
+            if bucket.tokens >= self.capacity:
+                del self._buckets[client_id]
+
+    # -----------------------
+    #       ADMISSION
+    # -----------------------
+
+    def _count(self, name: str, delta: int = 1):
+        with self._lock:
+            self._metrics[name] += delta
+
+    async def admit(self, client_id: str, cost: float) -> bool:
+        """
+        Admit a request or raise 429. Returns True when a heavy slot was
+        taken; the caller must then call release().
+        """
+        wait = self._take_tokens(client_id, cost)
+        if wait is not None:
+            self._count("rejected_rate_limited")
+            raise HTTPException(
+                status_code=429,
+                detail="rate limit exceeded for this client",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+
+        if cost < self.heavy_cost:
+            self._count("admitted")
+            return False
+
+        self._count("queued")
+        try:
+            await asyncio.wait_for(self._heavy_slots.acquire(), self.queue_timeout)
+            acquired = True
+        except asyncio.TimeoutError:
+            acquired = False
+        finally:
+            self._count("queued", -1)
+        if not acquired:
+            # the client was turned away for global load, not its own rate
+            self._refund_tokens(client_id, cost)
+            self._count("rejected_overloaded")
+            raise HTTPException(
+                status_code=429,
+                detail="too many expensive queries in progress",
+                headers={"Retry-After": "1"},
+            )
+
+        self._count("admitted")
+        self._count("admitted_heavy")
+        self._count("heavy_in_flight")
+        return True
+
+    def release(self):
+        self._count("heavy_in_flight", -1)
+        self._heavy_slots.release()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._metrics,
+                "tracked_clients": len(self._buckets),
+                "heavy_slots": self.heavy_concurrency,
+            }
+
+
+admission = AdmissionController()
+
+
+def client_id_for(request: Request) -> str:
+    if admission.client_header:
+        trusted = request.headers.get(admission.client_header)
+        if trusted:
+            return trusted
+    return request.client.host if request.client else "anonymous"
+
+
+@asynccontextmanager
+async def _admitted(request: Request, cost: float) -> AsyncIterator[None]:
+    heavy = await admission.admit(client_id_for(request), cost)
+    try:
+        yield
+    finally:
+        if heavy:
+            admission.release()
+
+
+async def admit_list_query(request: Request):
+    """FastAPI dependency guarding the list endpoints."""
+    if not admission.enabled:
+        yield
+        return
+
+    params = request.query_params
+    try:
+        page = max(1, int(params.get("page", 1)))
+        size = max(1, int(params.get("size", 20)))
+    except ValueError:
+        # let the endpoint's own validation produce the 422
+        yield
+        return
+
+    filters = {k: params[k] for k in EQUALITY_FILTERS if params.get(k)}
+    cost = estimate_cost(
+        page=page,
+        size=size,
+        sort_by=params.get("sort_by", "flight_id"),
+        filters=filters,
+        fields=params.get("fields"),
+    )
+
+    async with _admitted(request, cost):
+        yield
+
+
+async def admit_search_query(request: Request):
+    """FastAPI dependency guarding GET /flights/search."""
+    if not admission.enabled:
+        yield
+        return
+
+    params = request.query_params
+    try:
+        size = max(1, int(params.get("size", 20)))
+    except ValueError:
+        yield
+        return
+
+    cost = estimate_search_cost(params.get("q", ""), size, params.get("fields"))
+    async with _admitted(request, cost):
+        yield
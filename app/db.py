@@ -1,12 +1,20 @@
 # app/db.py
+import logging
+import os
 import sqlite3
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
 DB_PATH = Path(__file__).resolve().parent.parent / "flights.db"
 
-SCHEMA_SQL = """
-PRAGMA foreign_keys = ON;
+# Partitioned storage: flights/flight_logs split into one SQLite file per
+# departure month under PARTITIONS_DIR (enable with FLIGHTS_PARTITIONED=1)
+PARTITIONED = os.environ.get("FLIGHTS_PARTITIONED", "0") == "1"
+PARTITIONS_DIR = DB_PATH.parent / "partitions"
+ARCHIVE_DIR = PARTITIONS_DIR / "archive"
 
+FLIGHT_TABLES_SQL = """
 CREATE TABLE IF NOT EXISTS flights (
     flight_id INTEGER PRIMARY KEY,
     flight_number TEXT NOT NULL,
@@ -36,15 +44,100 @@ CREATE TABLE IF NOT EXISTS flight_logs (
 );
 """
 
+SCHEMA_SQL = """
+PRAGMA foreign_keys = ON;
+""" + FLIGHT_TABLES_SQL + """
+-- flight_id -> partition directory, used only by the partitioned engine
+CREATE TABLE IF NOT EXISTS flight_partitions (
+    flight_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    partition_key TEXT NOT NULL
+);
 
-def init_db():
-    con = sqlite3.connect(str(DB_PATH), check_same_thread=False, timeout=10)
-    con.executescript(SCHEMA_SQL)
+CREATE INDEX IF NOT EXISTS idx_flight_partitions_key
+    ON flight_partitions(partition_key);
+"""
+
+# Full-text/prefix search index over the searchable text columns, kept in
+# sync with flights by triggers (external-content FTS5 table)
+FTS_SCHEMA_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS flights_fts USING fts5(
+    flight_number, origin, destination, aircraft_type,
+    content='flights', content_rowid='flight_id', prefix='2 3 4'
+);
+
+CREATE TRIGGER IF NOT EXISTS flights_fts_ai AFTER INSERT ON flights BEGIN
+    INSERT INTO flights_fts(rowid, flight_number, origin, destination, aircraft_type)
+    VALUES (new.flight_id, new.flight_number, new.origin, new.destination, new.aircraft_type);
+END;
+
+CREATE TRIGGER IF NOT EXISTS flights_fts_ad AFTER DELETE ON flights BEGIN
+    INSERT INTO flights_fts(flights_fts, rowid, flight_number, origin, destination, aircraft_type)
+    VALUES ('delete', old.flight_id, old.flight_number, old.origin, old.destination, old.aircraft_type);
+END;
+
+CREATE TRIGGER IF NOT EXISTS flights_fts_au
+AFTER UPDATE OF flight_id, flight_number, origin, destination, aircraft_type ON flights BEGIN
+    INSERT INTO flights_fts(flights_fts, rowid, flight_number, origin, destination, aircraft_type)
+    VALUES ('delete', old.flight_id, old.flight_number, old.origin, old.destination, old.aircraft_type);
+    INSERT INTO flights_fts(rowid, flight_number, origin, destination, aircraft_type)
+    VALUES (new.flight_id, new.flight_number, new.origin, new.destination, new.aircraft_type);
+END;
+"""
+
+# bump whenever SCHEMA_SQL changes; stored in PRAGMA user_version so that
+# startup can skip re-running the DDL on an up-to-date database
+SCHEMA_VERSION = 2
+
+PARTITION_SCHEMA_SQL = """
+PRAGMA foreign_keys = ON;
+""" + FLIGHT_TABLES_SQL
+
+
+def _apply_schema(con: sqlite3.Connection, script: str) -> bool:
+    version = con.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return False
+    con.executescript(script)
+    try:
+        con.executescript(FTS_SCHEMA_SQL)
+        # index rows that existed before the triggers did
+        con.execute("INSERT INTO flights_fts(flights_fts) VALUES ('rebuild')")
+    except sqlite3.OperationalError as e:
+        # SQLite built without FTS5: search falls back to LIKE scans
+        logger.warning(f"Full-text index unavailable: {e}")
+    con.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
     con.commit()
-    con.close()
+    return True
 
 
-def get_connection() -> sqlite3.Connection:
+def init_db() -> bool:
+    """Create/upgrade the schema. Returns False when it was already current."""
     con = sqlite3.connect(str(DB_PATH), check_same_thread=False, timeout=10)
+    try:
+        return _apply_schema(con, SCHEMA_SQL)
+    finally:
+        con.close()
+
+
+def _configure(con: sqlite3.Connection) -> sqlite3.Connection:
     con.row_factory = sqlite3.Row  # مهم‌ترین بخش برای جلوگیری از خطای 500 هنگام SELECT ستون‌های خاص
-    return con
\ No newline at end of file
+    # INSERT OR REPLACE must fire the delete trigger that keeps flights_fts in sync
+    con.execute("PRAGMA recursive_triggers = ON")
+    return con
+
+
+def get_connection() -> sqlite3.Connection:
+    con = sqlite3.connect(str(DB_PATH), check_same_thread=False, timeout=10)
+    return _configure(con)
+
+
+def partition_path(key: str) -> Path:
+    return PARTITIONS_DIR / f"flights_{key}.db"
+
+
+def get_partition_connection(key: str) -> sqlite3.Connection:
+    PARTITIONS_DIR.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(str(partition_path(key)), check_same_thread=False, timeout=10)
+    _apply_schema(con, PARTITION_SCHEMA_SQL)
+    con.execute("PRAGMA foreign_keys = ON")
+    return _configure(con)
@@ -0,0 +1,358 @@
+# app/hot_flights.py
+"""
+In-memory working set of upcoming flights (enable with FLIGHTS_HOT_CACHE=1).
+
+Flights departing within the next HOT_WINDOW_HOURS are held as compact
+__slots__ records keyed by flight_id, with route and status secondary
+indexes. FlightService serves single-flight reads and window-bounded list
+queries from it; every write goes to SQLite first and the returned row is
+then written through to the index, so the database stays the source of truth.
+
+The index is per process. Writes made by another worker (or directly in
+SQLite) only show up here on the next reload, so with several workers
+get_flight(), seats_available() and window-bounded lists can be up to
+FLIGHTS_HOT_REFRESH_SECONDS (default 300) stale. Write paths always read
+SQLite, so this never loses an update, but run a single worker or lower the
+refresh interval where stale availability is not acceptable.
+
+With FLIGHTS_HOT_CACHE_VERIFY=1 every read served from memory is compared
+against the database; mismatches are logged and repaired.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Set, Tuple, Optional
+
+from . import repositories
+from .partitions import normalise_time, row_sort_key
+from .repositories import ALLOWED_SELECT_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+HOT_CACHE_ENABLED = os.environ.get("FLIGHTS_HOT_CACHE", "0") == "1"
+HOT_CACHE_VERIFY = os.environ.get("FLIGHTS_HOT_CACHE_VERIFY", "0") == "1"
+HOT_WINDOW_HOURS = int(os.environ.get("FLIGHTS_HOT_WINDOW_HOURS", "72"))
+HOT_REFRESH_SECONDS = int(os.environ.get("FLIGHTS_HOT_REFRESH_SECONDS", "300"))
+
+FLIGHT_COLUMNS = (
+    "flight_id", "flight_number", "origin", "destination",
+    "departure_time", "arrival_time", "duration_minutes",
+    "aircraft_type", "seats_total", "seats_available",
+    "status", "created_at", "updated_at", "process_id",
+)
+
+# filters the index can answer by itself (anything else goes to SQLite)
+SERVABLE_FILTERS = {
+    "origin", "destination", "status", "flight_number",
+    "departure_from", "departure_to",
+}
+
+
+class FlightRecord:
+    __slots__ = FLIGHT_COLUMNS + ("departs_at",)
+
+    def __init__(self, row: Dict[str, Any]):
+        for col in FLIGHT_COLUMNS:
+            setattr(self, col, row.get(col))
+        # offsets converted to UTC, the way SQLite's datetime() compares them
+        self.departs_at = normalise_time(self.departure_time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {col: getattr(self, col) for col in FLIGHT_COLUMNS}
+
+
+class HotFlightIndex:
+    def __init__(
+        self,
+        enabled: bool = HOT_CACHE_ENABLED,
+        verify: bool = HOT_CACHE_VERIFY,
+        window_hours: int = HOT_WINDOW_HOURS,
+        refresh_seconds: int = HOT_REFRESH_SECONDS,
+    ):
+        self.enabled = enabled
+        self.verify_reads = verify
+        self.window = timedelta(hours=window_hours)
+        self.refresh_seconds = refresh_seconds
+
+        self._lock = threading.RLock()
+        # held by FlightService across "write SQLite, then put()" so
+        # concurrent writers reach the index in commit order
+        self.write_lock = threading.RLock()
+        # only one thread rebuilds the index; the others keep serving
+        self._refresh_lock = threading.RLock()
+        # while a reload reads SQLite, writes are recorded here (flight_id ->
+        # row, None = deleted) and replayed onto the new index before the swap
+        self._reload_writes: Optional[Dict[int, Optional[Dict[str, Any]]]] = None
+        self._records: Dict[int, FlightRecord] = {}
+        self._by_route: Dict[Tuple[str, str], Set[int]] = {}
+        self._by_status: Dict[str, Set[int]] = {}
+        self._window_start: Optional[datetime] = None
+        self._window_end: Optional[datetime] = None
+        self._loaded_at: Optional[float] = None
+
+    # -----------------------
+    #       LOADING
+    # -----------------------
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def load(self, now: Optional[datetime] = None) -> int:
+        """(Re)build the index from SQLite for the window starting at `now`."""
+        start = now or datetime.now()
+        end = start + self.window
+
+        with self._refresh_lock:
+            with self._lock:
+                self._reload_writes = {}
+            try:
+                # writers are not blocked while the window is read
+                records = {}
+                for row in repositories.iter_flights_departing(
+                    start.isoformat(), end.isoformat()
+                ):
+                    record = FlightRecord(row)
+                    if record.departs_at and start <= record.departs_at < end:
+                        records[record.flight_id] = record
+
+                with self._lock:
+                    self._records = {}
+                    self._by_route = {}
+                    self._by_status = {}
+                    self._window_start = start
+                    self._window_end = end
+                    for record in records.values():
+                        self._add(record)
+                    # writes that landed during the read win over the snapshot
+                    for flight_id, row in self._reload_writes.items():
+                        self._apply(flight_id, row)
+                    self._loaded_at = time.monotonic()
+            finally:
+                with self._lock:
+                    self._reload_writes = None
+
+        logger.info(f"Hot flight index loaded {len(self._records)} flights ({start} -> {end})")
+        return len(self._records)
+
+    def _stale(self) -> bool:
+        return time.monotonic() - self._loaded_at > self.refresh_seconds
+
+    def _ensure_fresh(self):
+        if self._loaded_at is None:
+            # nothing to serve yet: wait for whoever is loading
+            with self._refresh_lock:
+                if self._loaded_at is None:
+                    self.load()
+            return
+        if not self._stale():
+            return
+        # one thread refreshes, concurrent readers keep the current index
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            if self._stale():
+                self.load()
+        finally:
+            self._refresh_lock.release()
+
+    def _in_window(self, record: FlightRecord) -> bool:
+        return (
+            record.departs_at is not None
+            and self._window_start <= record.departs_at < self._window_end
+        )
+
+    # -----------------------
+    #    INDEX MAINTENANCE
+    # -----------------------
+
+    def _add(self, record: FlightRecord):
+        self._records[record.flight_id] = record
+        route = (record.origin, record.destination)
+        self._by_route.setdefault(route, set()).add(record.flight_id)
+        self._by_status.setdefault(record.status, set()).add(record.flight_id)
+
+    def _remove(self, flight_id: int):
+        record = self._records.pop(flight_id, None)
+        if record is None:
+            return
+        route = (record.origin, record.destination)
+        self._by_route.get(route, set()).discard(flight_id)
+        if not self._by_route.get(route):
+            self._by_route.pop(route, None)
+        self._by_status.get(record.status, set()).discard(flight_id)
+        if not self._by_status.get(record.status):
+            self._by_status.pop(record.status, None)
+
+    def _apply(self, flight_id: int, row: Optional[Dict[str, Any]]):
+        self._remove(flight_id)
+        if row is not None:
+            record = FlightRecord(row)
+            if self._in_window(record):
+                self._add(record)
+
+    def put(self, row: Optional[Dict[str, Any]]):
+        """Write a fresh database row through to the index."""
+        if row is None:
+            return
+        with self._lock:
+            if self._reload_writes is not None:
+                self._reload_writes[row["flight_id"]] = row
+            if self.loaded:
+                self._apply(row["flight_id"], row)
+
+    def discard(self, flight_id: int):
+        with self._lock:
+            if self._reload_writes is not None:
+                self._reload_writes[flight_id] = None
+            self._remove(flight_id)
+
+    def invalidate(self):
+        with self._lock:
+            self._records = {}
+            self._by_route = {}
+            self._by_status = {}
+            self._loaded_at = None
+
+    # -----------------------
+    #         READS
+    # -----------------------
+
+    def get(self, flight_id: int) -> Optional[Dict[str, Any]]:
+        """Cached flight, or None when the flight is outside the working set."""
+        self._ensure_fresh()
+        with self._lock:
+            record = self._records.get(flight_id)
+            row = record.to_dict() if record else None
+        if row is not None and self.verify_reads:
+            row = self._verify_row(flight_id, row)
+        return row
+
+    def seats_available(self, flight_id: int) -> Optional[int]:
+        row = self.get(flight_id)
+        return row["seats_available"] if row else None
+
+    def covers(self, filters: Dict[str, Any]) -> bool:
+        """True when a list query with these filters lies inside the window."""
+        if not set(filters) <= SERVABLE_FILTERS:
+            return False
+        self._ensure_fresh()
+        low = normalise_time(filters.get("departure_from"))
+        high = normalise_time(filters.get("departure_to"))
+        return (
+            low is not None and high is not None
+            and self._window_start <= low and high <= self._window_end
+        )
+
+    def list_flights(
+        self,
+        page: int,
+        size: int,
+        filters: Dict[str, Any],
+        sort_by: str,
+        sort_order: str,
+        fields: Optional[str],
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        field_list = None
+        if fields:
+            field_list = [f.strip() for f in fields.split(",") if f.strip()]
+            for f in field_list:
+                if f not in ALLOWED_SELECT_COLUMNS:
+                    raise ValueError(f"Invalid field name: {f}")
+        if sort_by not in ALLOWED_SELECT_COLUMNS:
+            raise ValueError("Invalid sort column")
+        if sort_order.lower() not in ("asc", "desc"):
+            raise ValueError("Invalid sort order")
+
+        low = normalise_time(filters.get("departure_from"))
+        high = normalise_time(filters.get("departure_to"))
+
+        with self._lock:
+            if "origin" in filters and "destination" in filters:
+                route = (filters["origin"], filters["destination"])
+                candidates = set(self._by_route.get(route, ()))
+            elif "status" in filters:
+                candidates = set(self._by_status.get(filters["status"], ()))
+            else:
+                candidates = set(self._records)
+
+            rows = []
+            for flight_id in candidates:
+                record = self._records[flight_id]
+                if any(
+                    getattr(record, k) != filters[k]
+                    for k in ("origin", "destination", "status", "flight_number")
+                    if k in filters
+                ):
+                    continue
+                if not (low <= record.departs_at < high):
+                    continue
+                rows.append(record.to_dict())
+
+        rows.sort(key=row_sort_key(sort_by), reverse=sort_order.lower() == "desc")
+        total = len(rows)
+        offset = (page - 1) * size
+        rows = rows[offset:offset + size]
+
+        if field_list:
+            rows = [{f: row[f] for f in field_list} for row in rows]
+        return rows, total
+
+    # -----------------------
+    #      CONSISTENCY
+    # -----------------------
+
+    def _verify_row(self, flight_id: int, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        with self.write_lock:
+            db_row = repositories.get_flight(flight_id)
+            if db_row != row:
+                logger.warning(f"Hot flight index mismatch for flight {flight_id}, repairing")
+                with self._lock:
+                    self._remove(flight_id)
+                self.put(db_row)
+                return db_row
+        return row
+
+    def verify(self, repair: bool = True) -> Dict[str, Any]:
+        """
+        Compare the whole index against SQLite for the current window.
+        Returns the ids that differ, are missing from memory, or are stale.
+        """
+        # writes wait, so the comparison and the repair see one DB state
+        with self.write_lock:
+            with self._lock:
+                start, end = self._window_start, self._window_end
+                snapshot = {fid: rec.to_dict() for fid, rec in self._records.items()}
+            if start is None:
+                return {"checked": 0, "mismatched": [], "missing": [], "extra": []}
+
+            expected = {}
+            for row in repositories.iter_flights_departing(start.isoformat(), end.isoformat()):
+                departs_at = normalise_time(row["departure_time"])
+                if departs_at and start <= departs_at < end:
+                    expected[row["flight_id"]] = row
+
+            report = {
+                "checked": len(expected),
+                "mismatched": sorted(
+                    fid for fid in expected.keys() & snapshot.keys()
+                    if expected[fid] != snapshot[fid]
+                ),
+                "missing": sorted(expected.keys() - snapshot.keys()),
+                "extra": sorted(snapshot.keys() - expected.keys()),
+            }
+
+            if repair:
+                with self._lock:
+                    for fid in report["extra"]:
+                        self._remove(fid)
+                    for fid in report["mismatched"] + report["missing"]:
+                        self._remove(fid)
+                        self._add(FlightRecord(expected[fid]))
+            return report
+
+
+hot_flights = HotFlightIndex()
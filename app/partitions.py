@@ -0,0 +1,707 @@
+# app/partitions.py
+"""
+Partitioned storage engine used by app/repositories.py when PARTITIONED is on.
+
+Every departure month gets its own SQLite file (partitions/flights_YYYY_MM.db)
+holding that month's flights and their flight_logs; flights without a
+departure_time live in the "undated" partition. The main flights.db keeps a
+small flight_partitions directory (flight_id -> partition_key) which hands out
+globally unique flight ids and routes single-flight lookups.
+"""
+
+import heapq
+import json
+import logging
+import re
+import shutil
+import sqlite3
+from datetime import datetime, timezone
+from itertools import islice
+from pathlib import Path
+from typing import List, Dict, Any, Iterator, Tuple, Optional
+
+from .db import (
+    ARCHIVE_DIR,
+    get_connection,
+    get_partition_connection,
+    partition_path,
+)
+
+logger = logging.getLogger(__name__)
+
+UNDATED_PARTITION = "undated"
+
+_MONTH_RE = re.compile(r"^(\d{4})-(\d{2})")
+
+
+def normalise_time(value: Any) -> Optional[datetime]:
+    """
+    Parse a departure_time the way SQLite's datetime() reads it: values with
+    a UTC offset are converted to UTC, naive values are taken as they are.
+    Returns a naive datetime, or None when the value can't be parsed.
+    """
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def partition_key_for(departure_time: Any) -> str:
+    """Return the partition key (YYYY_MM) for a departure_time value."""
+    if departure_time is None:
+        return UNDATED_PARTITION
+    # same month the datetime(departure_time) range filter sees
+    parsed = normalise_time(departure_time)
+    if parsed is not None:
+        return parsed.strftime("%Y_%m")
+    match = _MONTH_RE.match(str(departure_time))
+    if not match:
+        return UNDATED_PARTITION
+    return f"{match.group(1)}_{match.group(2)}"
+
+
+def _lookup_partition(main_cur: sqlite3.Cursor, flight_id: int) -> Optional[str]:
+    main_cur.execute(
+        "SELECT partition_key FROM flight_partitions WHERE flight_id = ?",
+        (flight_id,),
+    )
+    row = main_cur.fetchone()
+    return row["partition_key"] if row else None
+
+
+def _partition_keys(
+    departure_from: Optional[str] = None,
+    departure_to: Optional[str] = None,
+) -> List[str]:
+    """Partitions that may hold flights departing inside the given range."""
+    con = get_connection()
+    try:
+        cur = con.cursor()
+        cur.execute("SELECT DISTINCT partition_key FROM flight_partitions")
+        keys = sorted(r["partition_key"] for r in cur.fetchall())
+    finally:
+        con.close()
+
+    if departure_from is None and departure_to is None:
+        return keys
+
+    low = partition_key_for(departure_from) if departure_from else None
+    high = partition_key_for(departure_to) if departure_to else None
+    selected = []
+    for key in keys:
+        if key == UNDATED_PARTITION:
+            # NULL departure_time never matches a range filter
+            continue
+        if low and low != UNDATED_PARTITION and key < low:
+            continue
+        if high and high != UNDATED_PARTITION and key > high:
+            continue
+        selected.append(key)
+    return selected
+
+
+def set_clause_for(
+    updates: Dict[str, Any],
+    increments: Optional[Dict[str, int]] = None,
+) -> Tuple[str, List[Any]]:
+    """
+    SET clause + values for an UPDATE. `increments` are applied relative to
+    the stored value inside SQLite, so concurrent deltas (e.g. seat counts
+    from several workers) never overwrite each other.
+    """
+    increments = increments or {}
+    parts = [f"{k}=?" for k in updates.keys()]
+    parts += [f"{k}=COALESCE({k}, 0) + ?" for k in increments.keys()]
+    return ", ".join(parts), list(updates.values()) + list(increments.values())
+
+
+def _insert_into_partition(key: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    con = get_partition_connection(key)
+    try:
+        cur = con.cursor()
+        cols = ", ".join(data.keys())
+        placeholders = ", ".join("?" for _ in data)
+        cur.execute(
+            f"INSERT INTO flights ({cols}) VALUES ({placeholders})",
+            list(data.values()),
+        )
+        con.commit()
+        cur.execute("SELECT * FROM flights WHERE flight_id = ?", (data["flight_id"],))
+        return dict(cur.fetchone())
+    finally:
+        con.close()
+
+
+# -----------------------
+#       CRUD OPERATIONS
+# -----------------------
+
+def create_flight(data: Dict[str, Any]) -> Dict[str, Any]:
+    key = partition_key_for(data.get("departure_time"))
+
+    con = get_connection()
+    try:
+        cur = con.cursor()
+        if data.get("flight_id") is not None:
+            cur.execute(
+                "INSERT INTO flight_partitions (flight_id, partition_key) VALUES (?, ?)",
+                (data["flight_id"], key),
+            )
+        else:
+            cur.execute(
+                "INSERT INTO flight_partitions (partition_key) VALUES (?)", (key,)
+            )
+        flight_id = cur.lastrowid
+        con.commit()
+
+        try:
+            return _insert_into_partition(key, {**data, "flight_id": flight_id})
+        except Exception:
+            # keep the directory consistent with the partition contents
+            cur.execute("DELETE FROM flight_partitions WHERE flight_id = ?", (flight_id,))
+            con.commit()
+            raise
+
+    except Exception as e:
+        logger.exception("Error in partitions.create_flight")
+        raise RuntimeError(f"Database error: {e}")
+
+    finally:
+        con.close()
+
+
+def create_flight_if_absent(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Insert a flight with a fixed flight_id unless that id is already taken
+    (used by the sample data loader). Returns None when it was taken.
+    """
+    key = partition_key_for(data.get("departure_time"))
+
+    con = get_connection()
+    try:
+        cur = con.cursor()
+        # claiming the id in the directory is the check and the insert in one
+        cur.execute(
+            "INSERT OR IGNORE INTO flight_partitions (flight_id, partition_key) VALUES (?, ?)",
+            (data["flight_id"], key),
+        )
+        con.commit()
+        if cur.rowcount == 0:
+            return None
+
+        try:
+            return _insert_into_partition(key, data)
+        except Exception:
+            cur.execute("DELETE FROM flight_partitions WHERE flight_id = ?", (data["flight_id"],))
+            con.commit()
+            raise
+
+    except Exception as e:
+        logger.exception("Error in partitions.create_flight_if_absent")
+        raise RuntimeError(f"Database error: {e}")
+
+    finally:
+        con.close()
+
+
+def get_flight(flight_id: int) -> Optional[Dict[str, Any]]:
+    con = get_connection()
+    try:
+        key = _lookup_partition(con.cursor(), flight_id)
+    finally:
+        con.close()
+    if key is None:
+        return None
+
+    pcon = get_partition_connection(key)
+    try:
+        cur = pcon.cursor()
+        cur.execute("SELECT * FROM flights WHERE flight_id = ?", (flight_id,))
+        row = cur.fetchone()
+        return dict(row) if row else None
+
+    except Exception as e:
+        logger.exception("Error in partitions.get_flight")
+        raise RuntimeError(f"Database error: {e}")
+
+    finally:
+        pcon.close()
+
+
+def delete_flight(flight_id: int) -> bool:
+    con = get_connection()
+    try:
+        cur = con.cursor()
+        key = _lookup_partition(cur, flight_id)
+        if key is None:
+            return False
+
+        pcon = get_partition_connection(key)
+        try:
+            pcur = pcon.cursor()
+            pcur.execute("DELETE FROM flights WHERE flight_id = ?", (flight_id,))
+            pcon.commit()
+            deleted = pcur.rowcount > 0
+        finally:
+            pcon.close()
+
+        cur.execute("DELETE FROM flight_partitions WHERE flight_id = ?", (flight_id,))
+        con.commit()
+        return deleted
+
+    except Exception as e:
+        logger.exception("Error in partitions.delete_flight")
+        raise RuntimeError(f"Database error: {e}")
+
+    finally:
+        con.close()
+
+
+def update_flight(
+    flight_id: int,
+    updates: Dict[str, Any],
+    increments: Optional[Dict[str, int]] = None,
+) -> Optional[Dict[str, Any]]:
+    con = get_connection()
+    try:
+        cur = con.cursor()
+        key = _lookup_partition(cur, flight_id)
+        if key is None:
+            return None
+
+        pcon = get_partition_connection(key)
+        try:
+            pcur = pcon.cursor()
+            set_clause, values = set_clause_for(updates, increments)
+            pcur.execute(
+                f"""
+                UPDATE flights
+                SET {set_clause}, updated_at = datetime('now')
+                WHERE flight_id = ?
+                """,
+                values + [flight_id],
+            )
+            pcon.commit()
+            pcur.execute("SELECT * FROM flights WHERE flight_id = ?", (flight_id,))
+            row = pcur.fetchone()
+            if row is None:
+                return None
+            flight = dict(row)
+
+            new_key = partition_key_for(flight["departure_time"])
+            if new_key == key:
+                return flight
+
+            # departure month changed: move the flight and its logs across
+            pcur.execute(
+                "SELECT * FROM flight_logs WHERE flight_id = ? ORDER BY id", (flight_id,)
+            )
+            logs = [dict(r) for r in pcur.fetchall()]
+            _move_flight(flight, logs, new_key)
+            pcur.execute("DELETE FROM flights WHERE flight_id = ?", (flight_id,))
+            pcon.commit()
+        finally:
+            pcon.close()
+
+        cur.execute(
+            "UPDATE flight_partitions SET partition_key = ? WHERE flight_id = ?",
+            (new_key, flight_id),
+        )
+        con.commit()
+        return flight
+
+    except Exception as e:
+        logger.exception("Error in partitions.update_flight")
+        raise RuntimeError(f"Database error: {e}")
+
+    finally:
+        con.close()
+
+
+def _move_flight(flight: Dict[str, Any], logs: List[Dict[str, Any]], key: str):
+    con = get_partition_connection(key)
+    try:
+        cur = con.cursor()
+        cols = ", ".join(flight.keys())
+        placeholders = ", ".join("?" for _ in flight)
+        cur.execute(
+            f"INSERT OR REPLACE INTO flights ({cols}) VALUES ({placeholders})",
+            list(flight.values()),
+        )
+        for log in logs:
+            log.pop("id", None)
+            log_cols = ", ".join(log.keys())
+            log_placeholders = ", ".join("?" for _ in log)
+            cur.execute(
+                f"INSERT INTO flight_logs ({log_cols}) VALUES ({log_placeholders})",
+                list(log.values()),
+            )
+        con.commit()
+    finally:
+        con.close()
+
+
+# -----------------------
+#       LIST / FILTER
+# -----------------------
+
+def row_sort_key(sort_by: str):
+    # mirror SQLite ordering: NULLs first ascending, last descending;
+    # flight_id breaks ties the same way the per-partition ORDER BY does
+    def key(row):
+        value = row[sort_by]
+        return (value is not None, value, row["flight_id"])
+    return key
+
+
+def list_flights(
+    page: int,
+    size: int,
+    field_list: Optional[List[str]],
+    where_sql: str,
+    params: List[Any],
+    sort_by: str,
+    sort_order: str,
+    departure_from: Optional[str] = None,
+    departure_to: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Fan the (already validated) query out to every partition overlapping the
+    departure range and merge the per-partition sorted pages.
+    """
+    if field_list:
+        helper_cols = [c for c in (sort_by, "flight_id") if c not in field_list]
+        select_clause = ", ".join(list(dict.fromkeys(field_list)) + helper_cols)
+    else:
+        helper_cols = []
+        select_clause = "*"
+
+    order = sort_order.upper()
+    offset = (page - 1) * size
+    # every partition must contribute enough rows to cover the requested page
+    limit = offset + size
+
+    total = 0
+    partition_rows = []
+    for key in _partition_keys(departure_from, departure_to):
+        if not partition_path(key).exists():
+            continue
+        con = get_partition_connection(key)
+        try:
+            cur = con.cursor()
+            cur.execute(f"SELECT COUNT(*) AS cnt FROM flights {where_sql}", params)
+            cnt = cur.fetchone()["cnt"]
+            if cnt == 0:
+                continue
+            total += cnt
+
+            sql = f"""
+                SELECT {select_clause}
+                FROM flights
+                {where_sql}
+                ORDER BY {sort_by} {order}, flight_id {order}
+                LIMIT ?
+            """
+            logger.debug(f"PARTITION {key} SQL: {sql} with params {params + [limit]}")
+            cur.execute(sql, params + [limit])
+            partition_rows.append([dict(r) for r in cur.fetchall()])
+
+        except sqlite3.Error as e:
+            logger.exception("SQLite error in partitions.list_flights")
+            raise RuntimeError(f"Database error: {e}")
+
+        finally:
+            con.close()
+
+    merged = heapq.merge(
+        *partition_rows, key=row_sort_key(sort_by), reverse=(order == "DESC")
+    )
+    rows = list(islice(merged, offset, limit))
+
+    for row in rows:
+        for col in helper_cols:
+            row.pop(col, None)
+    return rows, total
+
+
+def iter_flights_departing(departure_from: str, departure_to: str) -> Iterator[Dict[str, Any]]:
+    """Stream flights in a departure range from the partitions covering it."""
+    for key in _partition_keys(departure_from, departure_to):
+        if not partition_path(key).exists():
+            continue
+        con = get_partition_connection(key)
+        try:
+            cur = con.execute(
+                """
+                SELECT * FROM flights
+                WHERE datetime(departure_time) >= datetime(?)
+                  AND datetime(departure_time) < datetime(?)
+                """,
+                (departure_from, departure_to),
+            )
+            for row in cur:
+                yield dict(row)
+        finally:
+            con.close()
+
+
+def search_flights(sql: str, params: List[Any], size: int) -> List[Dict[str, Any]]:
+    """
+    Run a ranked search query (ordered by match_rank, flight_id) on every
+    partition and merge the results. match_rank only depends on the row
+    itself, so the merged order is the same as on a single table. sqlite3
+    errors propagate so the caller can fall back when a partition has no
+    flights_fts table.
+    """
+    partition_rows = []
+    for key in _partition_keys():
+        if not partition_path(key).exists():
+            continue
+        con = get_partition_connection(key)
+        try:
+            cur = con.cursor()
+            cur.execute(sql, params)
+            partition_rows.append([dict(r) for r in cur.fetchall()])
+        finally:
+            con.close()
+
+    merged = heapq.merge(
+        *partition_rows, key=lambda r: (r["match_rank"], r["flight_id"])
+    )
+    return list(islice(merged, size))
+
+
+# -----------------------
+#      LOGGING
+# -----------------------
+
+def insert_flight_log(
+    flight_id: int,
+    changed_by: str,
+    change_summary: str,
+    old_data: Optional[Dict],
+    new_data: Optional[Dict]
+) -> int:
+    con = get_connection()
+    try:
+        key = _lookup_partition(con.cursor(), flight_id)
+    finally:
+        con.close()
+    if key is None:
+        raise RuntimeError(f"Database error: flight {flight_id} has no partition")
+
+    pcon = get_partition_connection(key)
+    try:
+        cur = pcon.cursor()
+        cur.execute(
+            """
+            INSERT INTO flight_logs
+            (flight_id, changed_by, change_summary, old_data, new_data)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (
+                flight_id,
+                changed_by,
+                change_summary,
+                json.dumps(old_data, default=str) if old_data else None,
+                json.dumps(new_data, default=str) if new_data else None,
+            ),
+        )
+        pcon.commit()
+        return cur.lastrowid
+
+    except Exception as e:
+        logger.exception("Error in partitions.insert_flight_log")
+        raise RuntimeError(f"Database error: {e}")
+
+    finally:
+        pcon.close()
+
+
+# -----------------------
+#      MAINTENANCE
+# -----------------------
+
+def main_table_has_flights() -> bool:
+    con = get_connection()
+    try:
+        return con.execute("SELECT 1 FROM flights LIMIT 1").fetchone() is not None
+    finally:
+        con.close()
+
+
+def migrate_main_table(batch_size: int = 500) -> int:
+    """
+    Move flights (and their flight_logs) from the single main flights table
+    into the monthly partitions and register them in flight_partitions.
+
+    Each batch is copied first and only then deleted from the main table, and
+    every step is an upsert, so an interrupted run can simply be restarted.
+    Returns the number of flights moved.
+    """
+    moved = 0
+    con = get_connection()
+    try:
+        cur = con.cursor()
+        while True:
+            # take the write lock up front so workers starting together
+            # migrate one batch at a time instead of copying it twice
+            cur.execute("BEGIN IMMEDIATE")
+            cur.execute(
+                "SELECT * FROM flights ORDER BY flight_id LIMIT ?", (batch_size,)
+            )
+            flights = [dict(r) for r in cur.fetchall()]
+            if not flights:
+                con.commit()
+                break
+
+            by_key: Dict[str, List[Dict[str, Any]]] = {}
+            for flight in flights:
+                by_key.setdefault(partition_key_for(flight["departure_time"]), []).append(flight)
+
+            for key, group in by_key.items():
+                ids = [f["flight_id"] for f in group]
+                marks = ", ".join("?" for _ in ids)
+                cur.execute(
+                    f"""
+                    SELECT flight_id FROM flight_partitions
+                    WHERE flight_id IN ({marks}) AND partition_key != ?
+                    """,
+                    ids + [key],
+                )
+                clashes = [r["flight_id"] for r in cur.fetchall()]
+                if clashes:
+                    # already used by a partitioned flight; never overwrite it
+                    raise ValueError(f"flight ids already partitioned elsewhere: {clashes}")
+                cur.execute(
+                    f"SELECT * FROM flight_logs WHERE flight_id IN ({marks}) ORDER BY id",
+                    ids,
+                )
+                logs = [dict(r) for r in cur.fetchall()]
+                _copy_into_partition(key, group, logs)
+                cur.executemany(
+                    "INSERT OR REPLACE INTO flight_partitions (flight_id, partition_key) VALUES (?, ?)",
+                    [(fid, key) for fid in ids],
+                )
+
+            ids = [f["flight_id"] for f in flights]
+            marks = ", ".join("?" for _ in ids)
+            cur.execute(f"DELETE FROM flight_logs WHERE flight_id IN ({marks})", ids)
+            cur.execute(f"DELETE FROM flights WHERE flight_id IN ({marks})", ids)
+            con.commit()
+            moved += len(flights)
+            logger.info(f"Migrated {moved} flights into partitions")
+
+        return moved
+
+    except Exception as e:
+        logger.exception("Error in partitions.migrate_main_table")
+        raise RuntimeError(f"Database error: {e}")
+
+    finally:
+        con.close()
+
+
+def _copy_into_partition(key: str, flights: List[Dict[str, Any]], logs: List[Dict[str, Any]]):
+    con = get_partition_connection(key)
+    try:
+        cur = con.cursor()
+        ids = [f["flight_id"] for f in flights]
+        marks = ", ".join("?" for _ in ids)
+        # logs left behind by an interrupted run are replaced, not duplicated
+        cur.execute(f"DELETE FROM flight_logs WHERE flight_id IN ({marks})", ids)
+        for flight in flights:
+            cols = ", ".join(flight.keys())
+            placeholders = ", ".join("?" for _ in flight)
+            cur.execute(
+                f"INSERT OR REPLACE INTO flights ({cols}) VALUES ({placeholders})",
+                list(flight.values()),
+            )
+        for log in logs:
+            log.pop("id", None)
+            log_cols = ", ".join(log.keys())
+            log_placeholders = ", ".join("?" for _ in log)
+            cur.execute(
+                f"INSERT INTO flight_logs ({log_cols}) VALUES ({log_placeholders})",
+                list(log.values()),
+            )
+        con.commit()
+    finally:
+        con.close()
+
+
+def list_partitions() -> List[Dict[str, Any]]:
+    con = get_connection()
+    try:
+        cur = con.cursor()
+        cur.execute(
+            """
+            SELECT partition_key, COUNT(*) AS flights
+            FROM flight_partitions
+            GROUP BY partition_key
+            ORDER BY partition_key
+            """
+        )
+        return [
+            {
+                "partition_key": r["partition_key"],
+                "flights": r["flights"],
+                "path": str(partition_path(r["partition_key"])),
+            }
+            for r in cur.fetchall()
+        ]
+    finally:
+        con.close()
+
+
+def archive_partition(key: str, archive_dir: Optional[Path] = None) -> Path:
+    """
+    Detach a partition: move the SQLite file into the archive folder, then
+    drop its flights from the directory. No rows are copied, so this is cheap
+    regardless of partition size. A month archived again (flights created
+    after the first archive) gets a numbered file next to the earlier one.
+    Returns the archived file path.
+    """
+    source = partition_path(key)
+    if not source.exists():
+        raise ValueError(f"Unknown partition: {key}")
+
+    target_dir = archive_dir or ARCHIVE_DIR
+    target_dir.mkdir(parents=True, exist_ok=True)
+    target = target_dir / source.name
+    n = 1
+    while target.exists():
+        target = target_dir / f"{source.stem}.{n}{source.suffix}"
+        n += 1
+
+    shutil.move(str(source), str(target))
+    con = get_connection()
+    try:
+        cur = con.cursor()
+        cur.execute("DELETE FROM flight_partitions WHERE partition_key = ?", (key,))
+        con.commit()
+    except Exception:
+        # keep the flights reachable if the directory can't be updated
+        shutil.move(str(target), str(source))
+        raise
+    finally:
+        con.close()
+
+    logger.info(f"Archived partition {key} to {target}")
+    return target
+
+
+def archive_before(key: str, archive_dir: Optional[Path] = None) -> List[Path]:
+    """Archive every dated partition strictly older than `key` (YYYY_MM)."""
+    archived = []
+    for part in list_partitions():
+        part_key = part["partition_key"]
+        if part_key != UNDATED_PARTITION and part_key < key:
+            archived.append(archive_partition(part_key, archive_dir))
+    return archived
@@ -1,10 +1,12 @@
 # app/repositories.py
 
+import re
 import sqlite3
 import json
 import logging
-from typing import List, Dict, Any, Tuple, Optional
-from .db import get_connection
+from typing import List, Dict, Any, Iterator, Tuple, Optional
+from .db import get_connection, PARTITIONED
+from . import partitions
 
 # setup logging
 logging.basicConfig(level=logging.DEBUG)
@@ -22,6 +24,13 @@ ALLOWED_SORT_COLUMNS = {
 ALLOWED_SELECT_COLUMNS = ALLOWED_SORT_COLUMNS.copy()
 
 
+# departure_time is stored both as "YYYY-MM-DDTHH:MM:SS" and
+# "YYYY-MM-DD HH:MM:SS" (sometimes with an offset): datetime() normalises both
+DEPARTURE_RANGE_SQL = (
+    "datetime(departure_time) >= datetime(?) AND datetime(departure_time) < datetime(?)"
+)
+
+
 def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
     return dict(row)
 
@@ -31,6 +40,9 @@ def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
 # -----------------------
 
 def create_flight(data: Dict[str, Any]) -> Dict[str, Any]:
+    if PARTITIONED:
+        return partitions.create_flight(data)
+
     try:
         con = get_connection()
         cur = con.cursor()
@@ -60,6 +72,9 @@ def create_flight(data: Dict[str, Any]) -> Dict[str, Any]:
 
 
 def get_flight(flight_id: int) -> Optional[Dict[str, Any]]:
+    if PARTITIONED:
+        return partitions.get_flight(flight_id)
+
     try:
         con = get_connection()
         cur = con.cursor()
@@ -78,6 +93,9 @@ def get_flight(flight_id: int) -> Optional[Dict[str, Any]]:
 
 
 def delete_flight(flight_id: int) -> bool:
+    if PARTITIONED:
+        return partitions.delete_flight(flight_id)
+
     try:
         con = get_connection()
         cur = con.cursor()
@@ -95,13 +113,20 @@ def delete_flight(flight_id: int) -> bool:
         con.close()
 
 
-def update_flight(flight_id: int, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+def update_flight(
+    flight_id: int,
+    updates: Dict[str, Any],
+    increments: Optional[Dict[str, int]] = None,
+) -> Optional[Dict[str, Any]]:
+    if PARTITIONED:
+        return partitions.update_flight(flight_id, updates, increments)
+
     try:
         con = get_connection()
         cur = con.cursor()
 
-        set_clause = ", ".join(f"{k}=?" for k in updates.keys())
-        values = list(updates.values()) + [flight_id]
+        set_clause, values = partitions.set_clause_for(updates, increments)
+        values = values + [flight_id]
 
         sql = f"""
             UPDATE flights
@@ -152,6 +177,7 @@ def list_flights(
                 raise ValueError(f"Invalid field name: {f}")
         select_clause = ", ".join(field_list)
     else:
+        field_list = None
         select_clause = "*"
 
     # ---------------------
@@ -173,8 +199,30 @@ def list_flights(
             where_clauses.append(f"{k} = ?")
             params.append(v)
 
+    # departure_time range: values are stored both as "YYYY-MM-DDTHH:MM:SS"
+    # and "YYYY-MM-DD HH:MM:SS", so normalise both sides with datetime()
+    if filters.get("departure_from"):
+        where_clauses.append("datetime(departure_time) >= datetime(?)")
+        params.append(filters["departure_from"])
+    if filters.get("departure_to"):
+        where_clauses.append("datetime(departure_time) < datetime(?)")
+        params.append(filters["departure_to"])
+
     where_sql = f"WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
 
+    if PARTITIONED:
+        return partitions.list_flights(
+            page=page,
+            size=size,
+            field_list=field_list,
+            where_sql=where_sql,
+            params=params,
+            sort_by=sort_by,
+            sort_order=sort_order,
+            departure_from=filters.get("departure_from"),
+            departure_to=filters.get("departure_to"),
+        )
+
     # ---------------------
     # COUNT
     # ---------------------
@@ -232,6 +280,11 @@ def insert_flight_log(
     new_data: Optional[Dict]
 ) -> int:
 
+    if PARTITIONED:
+        return partitions.insert_flight_log(
+            flight_id, changed_by, change_summary, old_data, new_data
+        )
+
     try:
         con = get_connection()
         cur = con.cursor()
@@ -260,3 +313,178 @@ def insert_flight_log(
 
     finally:
         con.close()
+
+
+# -----------------------
+#      BULK READS
+# -----------------------
+
+def iter_flights_departing(
+    departure_from: str,
+    departure_to: str,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream every flight with departure_from <= departure_time < departure_to
+    from a single SELECT (no COUNT, no OFFSET paging).
+    """
+    if PARTITIONED:
+        yield from partitions.iter_flights_departing(departure_from, departure_to)
+        return
+
+    con = get_connection()
+    try:
+        cur = con.execute(
+            f"SELECT * FROM flights WHERE {DEPARTURE_RANGE_SQL}",
+            (departure_from, departure_to),
+        )
+        for row in cur:
+            yield _row_to_dict(row)
+    finally:
+        con.close()
+
+
+# -----------------------
+#        SEARCH
+# -----------------------
+
+SEARCH_COLUMNS = ("flight_number", "origin", "destination", "aircraft_type")
+
+
+def _search_terms(q: str) -> List[str]:
+    terms = re.findall(r"\w+", q or "")
+    if not terms:
+        raise ValueError("Empty search query")
+    return terms
+
+
+def _parse_cursor(after: Optional[str]) -> Optional[Tuple[int, int]]:
+    if not after:
+        return None
+    try:
+        match_rank, flight_id = after.split(":")
+        return int(match_rank), int(flight_id)
+    except ValueError:
+        raise ValueError("Invalid cursor")
+
+
+def _like_prefix(term: str) -> str:
+    # terms are \w+ so "_" is the only LIKE wildcard they can contain
+    return term.replace("_", "\\_") + "%"
+
+
+def _match_rank_sql(terms: List[str]) -> Tuple[str, List[Any]]:
+    """
+    Stable rank: 0 = a term prefixes flight_number, 1 = it prefixes origin or
+    destination, 2 = any other match (aircraft type, inner tokens). Unlike
+    bm25 it does not depend on corpus statistics, so it is identical in every
+    partition and does not shift when other rows change.
+    """
+    def any_prefix(columns):
+        sql = " OR ".join(
+            f"f.{c} LIKE ? ESCAPE '\\'" for _ in terms for c in columns
+        )
+        return f"({sql})", [_like_prefix(t) for t in terms for _ in columns]
+
+    number_sql, number_params = any_prefix(["flight_number"])
+    route_sql, route_params = any_prefix(["origin", "destination"])
+    sql = f"CASE WHEN {number_sql} THEN 0 WHEN {route_sql} THEN 1 ELSE 2 END"
+    return sql, number_params + route_params
+
+
+def search_flights(
+    q: str,
+    size: int = 20,
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Prefix search over flight_number, origin, destination and aircraft_type.
+    Results are ordered by (match_rank, flight_id), see _match_rank_sql, and
+    paginated with a keyset cursor ("match_rank:flight_id" of the last row)
+    instead of OFFSET. A row only moves between pages if its own searchable
+    text changes.
+    """
+    terms = _search_terms(q)
+    cursor = _parse_cursor(after)
+
+    if fields:
+        field_list = [f.strip() for f in fields.split(",") if f.strip()]
+        for f in field_list:
+            if f not in ALLOWED_SELECT_COLUMNS:
+                raise ValueError(f"Invalid field name: {f}")
+        select_clause = ", ".join(f"f.{c}" for c in field_list)
+    else:
+        field_list = None
+        select_clause = "f.*"
+
+    rank_sql, rank_params = _match_rank_sql(terms)
+
+    keyset_sql = ""
+    keyset_params: List[Any] = []
+    if cursor:
+        keyset_sql = "AND (match_rank > ? OR (match_rank = ? AND f.flight_id > ?))"
+        keyset_params = [cursor[0], cursor[0], cursor[1]]
+
+    # every term must match some column by prefix: "SP10" -> "SP10"*
+    match = " ".join(f'"{t}"*' for t in terms)
+    fts_sql = f"""
+        SELECT {select_clause}, f.flight_id AS flight_id,
+               {rank_sql} AS match_rank
+        FROM flights_fts
+        JOIN flights f ON f.flight_id = flights_fts.rowid
+        WHERE flights_fts MATCH ? {keyset_sql}
+        ORDER BY match_rank, f.flight_id
+        LIMIT ?
+    """
+    fts_params = rank_params + [match] + keyset_params + [size]
+
+    try:
+        rows = _run_search(fts_sql, fts_params, size)
+
+    except sqlite3.OperationalError as e:
+        if "flights_fts" not in str(e):
+            logger.exception("SQLite error in search_flights")
+            raise RuntimeError(f"Database error: {e}")
+        # no FTS5 in this SQLite build: same contract on top of LIKE scans
+        logger.warning("flights_fts unavailable, falling back to LIKE search")
+        term_sql = " AND ".join(
+            "(" + " OR ".join(f"f.{c} LIKE ? ESCAPE '\\'" for c in SEARCH_COLUMNS) + ")"
+            for _ in terms
+        )
+        like_params = [_like_prefix(t) for t in terms for _ in SEARCH_COLUMNS]
+        like_sql = f"""
+            SELECT {select_clause}, f.flight_id AS flight_id,
+                   {rank_sql} AS match_rank
+            FROM flights f
+            WHERE {term_sql} {keyset_sql}
+            ORDER BY match_rank, f.flight_id
+            LIMIT ?
+        """
+        rows = _run_search(
+            like_sql, rank_params + like_params + keyset_params + [size], size
+        )
+
+    next_cursor = None
+    if len(rows) == size:
+        last = rows[-1]
+        next_cursor = f"{last['match_rank']}:{last['flight_id']}"
+
+    for row in rows:
+        row.pop("match_rank", None)
+        if field_list and "flight_id" not in field_list:
+            row.pop("flight_id", None)
+    return rows, next_cursor
+
+
+def _run_search(sql: str, params: List[Any], size: int) -> List[Dict[str, Any]]:
+    if PARTITIONED:
+        return partitions.search_flights(sql, params, size)
+
+    con = get_connection()
+    try:
+        cur = con.cursor()
+        logger.debug(f"SEARCH SQL: {sql} with params {params}")
+        cur.execute(sql, params)
+        return [_row_to_dict(r) for r in cur.fetchall()]
+    finally:
+        con.close()
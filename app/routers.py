@@ -1,14 +1,18 @@
 # app/routers.py
 
-from fastapi import APIRouter, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import JSONResponse
 from typing import Optional, List
 from pydantic import BaseModel
 from .models import FlightCreate, FlightOut, FlightUpdate
 from .services import FlightService, AuditService
+from .admission import admission, admit_list_query, admit_search_query
+from .startup import state as startup_state
 from typing import Optional
 import logging
 
 router = APIRouter(prefix="/flights", tags=["flights"])
+health_router = APIRouter(prefix="/health", tags=["health"])
 logger = logging.getLogger(__name__)
 
 
@@ -41,13 +45,15 @@ def create_flight(payload: FlightCreate):
 # -----------------------------
 #     ❗ response_model را حذف می‌کنیم تا با fields=... سازگار شود
 # -----------------------------
-@router.get("/")
+@router.get("/", dependencies=[Depends(admit_list_query)])
 def list_flights(
     page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=200),
     origin: Optional[str] = None,
     destination: Optional[str] = None,
     status: Optional[str] = None,
+    departure_from: Optional[str] = None,
+    departure_to: Optional[str] = None,
     sort_by: str = Query("flight_id"),
     sort_order: str = Query("asc"),
     fields: Optional[str] = Query(None)
@@ -62,6 +68,10 @@ def list_flights(
         filters["destination"] = destination
     if status:
         filters["status"] = status
+    if departure_from:
+        filters["departure_from"] = departure_from
+    if departure_to:
+        filters["departure_to"] = departure_to
 
     try:
         rows, total = FlightService.list_flights(
@@ -91,13 +101,15 @@ def list_flights(
 # -----------------------------
 # Paginated List
 # -----------------------------
-@router.get("/paginated")
+@router.get("/paginated", dependencies=[Depends(admit_list_query)])
 def list_flights_with_meta(
     page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=200),
     origin: Optional[str] = None,
     destination: Optional[str] = None,
     status: Optional[str] = None,
+    departure_from: Optional[str] = None,
+    departure_to: Optional[str] = None,
     sort_by: str = Query("flight_id"),
     sort_order: str = Query("asc"),
     fields: Optional[str] = Query(None)
@@ -112,6 +124,10 @@ def list_flights_with_meta(
         filters["destination"] = destination
     if status:
         filters["status"] = status
+    if departure_from:
+        filters["departure_from"] = departure_from
+    if departure_to:
+        filters["departure_to"] = departure_to
 
     try:
         rows, total = FlightService.list_flights(
@@ -138,6 +154,34 @@ def list_flights_with_meta(
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+# -----------------------------
+# Search (flight number / route / aircraft prefix)
+# -----------------------------
+@router.get("/search", dependencies=[Depends(admit_search_query)])
+def search_flights(
+    q: str = Query(..., min_length=1),
+    size: int = Query(20, ge=1, le=200),
+    after: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None)
+):
+    try:
+        rows, next_cursor = FlightService.search_flights(
+            q=q, size=size, after=after, fields=fields
+        )
+        return {
+            "size": size,
+            "next_cursor": next_cursor,
+            "items": rows
+        }
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    except Exception as e:
+        logger.exception("Error in GET /flights/search")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
 # -----------------------------
 # Get Single Flight
 # -----------------------------
@@ -153,12 +197,23 @@ def get_flight(flight_id: int):
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+# -----------------------------
+# Seat Availability
+# -----------------------------
+@router.get("/{flight_id}/availability")
+def get_availability(flight_id: int):
+    seats = FlightService.seats_available(flight_id)
+    if seats is None and FlightService.get_flight(flight_id) is None:
+        raise HTTPException(status_code=404, detail="flight not found")
+    return {"flight_id": flight_id, "seats_available": seats}
+
+
 # -----------------------------
 # PUT - Full update
 # -----------------------------
 @router.put("/{flight_id}", response_model=FlightOut)
 def replace_flight(flight_id: int, payload: FlightCreate):
-    existing = FlightService.get_flight(flight_id)
+    existing = FlightService.get_flight_for_update(flight_id)
     if existing is None:
         raise HTTPException(status_code=404, detail="flight not found")
 
@@ -185,7 +240,7 @@ def replace_flight(flight_id: int, payload: FlightCreate):
 # -----------------------------
 @router.patch("/{flight_id}", response_model=FlightOut)
 def patch_flight(flight_id: int, payload: FlightUpdate):
-    existing = FlightService.get_flight(flight_id)
+    existing = FlightService.get_flight_for_update(flight_id)
     if existing is None:
         raise HTTPException(status_code=404, detail="flight not found")
 
@@ -234,11 +289,12 @@ class RegisterPayload(BaseModel):
 
 @router.post("/{flight_id}/register", response_model=FlightOut)
 def register_flight_action(flight_id: int, payload: RegisterPayload):
-    existing = FlightService.get_flight(flight_id)
+    existing = FlightService.get_flight_for_update(flight_id)
     if existing is None:
         raise HTTPException(status_code=404, detail="flight not found")
 
     updates = {}
+    increments = {}
     summary_parts = []
 
     if payload.new_status:
@@ -246,15 +302,16 @@ def register_flight_action(flight_id: int, payload: RegisterPayload):
         summary_parts.append(f"status -> {payload.new_status}")
 
     if payload.seats_available_delta is not None:
-        new_seats = (existing.get("seats_available") or 0) + payload.seats_available_delta
-        updates["seats_available"] = new_seats
-        summary_parts.append(f"seats_available -> {new_seats}")
+        # applied inside the UPDATE so concurrent bookings can't be lost
+        increments["seats_available"] = payload.seats_available_delta
 
-    if not updates:
+    if not updates and not increments:
         raise HTTPException(status_code=400, detail="nothing to update in register")
 
     try:
-        updated = FlightService.update_flight(flight_id, updates)
+        updated = FlightService.update_flight(flight_id, updates, increments)
+        if increments:
+            summary_parts.append(f"seats_available -> {updated['seats_available']}")
         change_summary = f"register: {'; '.join(summary_parts)}"
 
         AuditService.register_change(
@@ -269,4 +326,24 @@ def register_flight_action(flight_id: int, payload: RegisterPayload):
 
     except Exception as e:
         logger.exception("Error in POST /flights/{flight_id}/register")
-        raise HTTPException(status_code=500, detail="Internal Server Error")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+# -----------------------------
+# Liveness / Readiness
+# -----------------------------
+@health_router.get("/live")
+def liveness():
+    body = startup_state.as_dict()
+    return JSONResponse(status_code=200 if startup_state.live else 503, content=body)
+
+
+@health_router.get("/ready")
+def readiness():
+    body = startup_state.as_dict()
+    return JSONResponse(status_code=200 if startup_state.ready else 503, content=body)
+
+
+@health_router.get("/admission")
+def admission_metrics():
+    return admission.metrics()
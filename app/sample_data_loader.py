@@ -1,19 +1,29 @@
 # app/sample_data_loader.py
 import json
-from .db import DB_PATH, init_db, get_connection
+from .db import DB_PATH, PARTITIONED, init_db, get_connection
+from . import partitions
 from pathlib import Path
 
 
 def load_sample(path: Path):
+    """
+    Insert the sample flights, skipping ids that already exist: this runs in
+    the background after the app starts serving, so it must never overwrite
+    a flight created through the API in the meantime.
+    """
     init_db()
     with open(path, "r", encoding="utf-8") as f:
         data = json.load(f)
+    if PARTITIONED:
+        for item in data:
+            partitions.create_flight_if_absent(item)
+        return
     con = get_connection()
     cur = con.cursor()
     for item in data:
         cols = ", ".join(item.keys())
         placeholders = ", ".join("?" for _ in item)
-        cur.execute(f"INSERT OR REPLACE INTO flights ({cols}) VALUES ({placeholders})", tuple(
+        cur.execute(f"INSERT OR IGNORE INTO flights ({cols}) VALUES ({placeholders})", tuple(
             item.values()))
     con.commit()
     con.close()
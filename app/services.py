@@ -2,28 +2,74 @@
 from typing import Dict, Any, Tuple, List, Optional
 from . import repositories
 from .repositories import ALLOWED_SORT_COLUMNS
+from .hot_flights import hot_flights
 from typing import Optional
 
 class FlightService:
     @staticmethod
     def create_flight(payload: Dict[str, Any]) -> Dict[str, Any]:
         # set created/updated timestamps in DB with default values or use passed ones
-        return repositories.create_flight(payload)
+        if not hot_flights.enabled:
+            return repositories.create_flight(payload)
+        with hot_flights.write_lock:
+            row = repositories.create_flight(payload)
+            hot_flights.put(row)
+        return row
 
     @staticmethod
     def get_flight(flight_id: int) -> Optional[Dict[str, Any]]:
+        if hot_flights.enabled:
+            row = hot_flights.get(flight_id)
+            if row is not None:
+                return row
         return repositories.get_flight(flight_id)
 
+    @staticmethod
+    def get_flight_for_update(flight_id: int) -> Optional[Dict[str, Any]]:
+        # write paths always start from SQLite: another worker's cache
+        # (or this one's, between refreshes) may not have seen the latest write
+        return repositories.get_flight(flight_id)
+
+    @staticmethod
+    def seats_available(flight_id: int) -> Optional[int]:
+        if hot_flights.enabled:
+            seats = hot_flights.seats_available(flight_id)
+            if seats is not None:
+                return seats
+        row = repositories.get_flight(flight_id)
+        return row["seats_available"] if row else None
+
     @staticmethod
     def delete_flight(flight_id: int) -> bool:
-        return repositories.delete_flight(flight_id)
+        if not hot_flights.enabled:
+            return repositories.delete_flight(flight_id)
+        with hot_flights.write_lock:
+            ok = repositories.delete_flight(flight_id)
+            hot_flights.discard(flight_id)
+        return ok
 
     @staticmethod
-    def update_flight(flight_id: int, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        return repositories.update_flight(flight_id, updates)
+    def update_flight(flight_id: int, updates: Dict[str, Any], increments: Optional[Dict[str, int]] = None) -> Optional[Dict[str, Any]]:
+        if not hot_flights.enabled:
+            return repositories.update_flight(flight_id, updates, increments)
+        # write-through: SQLite first, then refresh the in-memory record;
+        # the write lock keeps concurrent writers from applying out of order
+        with hot_flights.write_lock:
+            row = repositories.update_flight(flight_id, updates, increments)
+            hot_flights.put(row)
+        return row
 
     @staticmethod
     def list_flights(page: int, size: int, filters: Dict[str, Any], sort_by: str, sort_order: str, fields: Optional[str]):
+        if hot_flights.enabled and hot_flights.covers(filters):
+            return hot_flights.list_flights(
+                page=page,
+                size=size,
+                filters=filters,
+                sort_by=sort_by,
+                sort_order=sort_order,
+                fields=fields
+            )
         return repositories.list_flights(
         page=page,
         size=size,
@@ -33,6 +79,9 @@ class FlightService:
         fields=fields
     )
 
+    @staticmethod
+    def search_flights(q: str, size: int, after: Optional[str], fields: Optional[str]):
+        return repositories.search_flights(q=q, size=size, after=after, fields=fields)
 
 
 class AuditService:
@@ -0,0 +1,145 @@
+# app/startup.py
+"""
+Startup pipeline.
+
+The blocking part only makes sure the schema is current (PRAGMA user_version,
+see db.init_db) so the app can accept traffic right away. Loading the sample
+data into an empty database and warming the hot flight index run in a
+background thread; /health/ready reports when they are done.
+"""
+
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from . import partitions
+from .db import PARTITIONED, get_connection, init_db
+from .hot_flights import hot_flights
+from .sample_data_loader import load_sample
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_PATH = Path(__file__).resolve().parent.parent / "flights_sample.json"
+
+# closest thing to process start we can measure from inside the app
+PROCESS_STARTED = time.monotonic()
+
+
+class StartupState:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.schema_migrated: Optional[bool] = None
+        self.schema_ready_at: Optional[float] = None
+        self.warmup_done_at: Optional[float] = None
+        self.warmup_error: Optional[str] = None
+        self.first_request_at: Optional[float] = None
+
+    @property
+    def live(self) -> bool:
+        return self.schema_ready_at is not None
+
+    @property
+    def ready(self) -> bool:
+        return self.live and self.warmup_done_at is not None
+
+    def mark_first_request(self):
+        if self.first_request_at is not None:
+            return
+        with self._lock:
+            if self.first_request_at is not None:
+                return
+            self.first_request_at = time.monotonic()
+        logger.info(
+            f"Time to first request: {self.first_request_at - PROCESS_STARTED:.3f}s"
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        def since_start(ts):
+            return round(ts - PROCESS_STARTED, 3) if ts is not None else None
+
+        return {
+            "live": self.live,
+            "ready": self.ready,
+            "schema_migrated": self.schema_migrated,
+            "schema_ready_s": since_start(self.schema_ready_at),
+            "warmup_done_s": since_start(self.warmup_done_at),
+            "warmup_error": self.warmup_error,
+            "first_request_s": since_start(self.first_request_at),
+        }
+
+
+state = StartupState()
+
+
+class FirstRequestMiddleware:
+    """
+    Pure ASGI middleware recording the first HTTP request. After that hit it
+    swaps itself for a direct call into the wrapped app, so later requests
+    pay no per-request work (unlike @app.middleware / BaseHTTPMiddleware).
+    Health probes arrive before any real traffic and are not counted.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._handle = self._first_request
+
+    async def __call__(self, scope, receive, send):
+        await self._handle(scope, receive, send)
+
+    async def _first_request(self, scope, receive, send):
+        if scope["type"] == "http" and not scope["path"].startswith("/health"):
+            self._handle = self.app
+            state.mark_first_request()
+        await self.app(scope, receive, send)
+
+
+def has_flights() -> bool:
+    """Cheap existence probe instead of COUNT(*) over the whole table."""
+    # in partitioned mode the flight directory holds one row per flight
+    table = "flight_partitions" if PARTITIONED else "flights"
+    con = get_connection()
+    try:
+        cur = con.cursor()
+        cur.execute(f"SELECT 1 FROM {table} LIMIT 1")
+        return cur.fetchone() is not None
+    finally:
+        con.close()
+
+
+def warmup():
+    try:
+        if SAMPLE_PATH.exists() and not has_flights():
+            load_sample(SAMPLE_PATH)
+            logger.info("Sample data loaded in background")
+        if hot_flights.enabled:
+            hot_flights.load()
+    except Exception as e:
+        logger.exception("Error during background warmup")
+        state.warmup_error = str(e)
+    finally:
+        # a failed warmup only costs speed (the index loads lazily),
+        # so it does not keep the instance out of rotation
+        state.warmup_done_at = time.monotonic()
+
+
+def run_startup(background: bool = True) -> Optional[threading.Thread]:
+    state.schema_migrated = init_db()
+    if PARTITIONED and partitions.main_table_has_flights():
+        # switching an existing database to partitioned storage: move its
+        # flights over before serving, or they would vanish from every endpoint
+        moved = partitions.migrate_main_table()
+        logger.info(f"Moved {moved} flights from the main table into partitions")
+    state.schema_ready_at = time.monotonic()
+    logger.info(
+        f"Schema ready in {state.schema_ready_at - PROCESS_STARTED:.3f}s "
+        f"(migrated={state.schema_migrated})"
+    )
+
+    if not background:
+        warmup()
+        return None
+    thread = threading.Thread(target=warmup, name="flights-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,144 @@
+# benchmarks/search_benchmark.py
+"""
+Compare GET /flights/search (FTS5 prefix index) against LIKE scans, both the
+unranked baseline and search_flights' own LIKE fallback (same match_rank
+ordering and keyset cursor, used when SQLite has no FTS5).
+
+    python -m benchmarks.search_benchmark --rows 1000000
+
+Builds a throwaway database with synthetic flights (the real flights.db is
+not touched) and reports the median latency of each query shape.
+"""
+
+import argparse
+import logging
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from app import db, repositories
+
+AIRPORTS = ["THR", "JED", "MHD", "IST", "DXB", "DOH", "KIH", "SYZ", "IFN", "TBZ"]
+AIRCRAFT = ["A320", "A321", "A330", "B737", "B747", "B777", "ATR72", "F100"]
+
+
+def build_database(path: Path, rows: int, seed: int = 42):
+    db.DB_PATH = path
+    db.init_db()
+    rnd = random.Random(seed)
+    con = sqlite3.connect(str(path))
+    con.executemany(
+        """
+        INSERT INTO flights
+        (flight_id, flight_number, origin, destination, aircraft_type, seats_total, seats_available, status)
+        VALUES (?, ?, ?, ?, ?, 150, 150, 'scheduled')
+        """,
+        (
+            (
+                i,
+                f"{rnd.choice(['SP', 'IR', 'W5', 'EP'])}{rnd.randint(100, 99999)}",
+                rnd.choice(AIRPORTS),
+                rnd.choice(AIRPORTS),
+                rnd.choice(AIRCRAFT),
+            )
+            for i in range(1, rows + 1)
+        ),
+    )
+    con.commit()
+    con.close()
+
+
+def like_scan(pattern: str, size: int):
+    con = db.get_connection()
+    try:
+        cols = repositories.SEARCH_COLUMNS
+        sql = f"""
+            SELECT * FROM flights
+            WHERE {" OR ".join(f"{c} LIKE ?" for c in cols)}
+            ORDER BY flight_id
+            LIMIT ?
+        """
+        return con.execute(sql, [pattern] * len(cols) + [size]).fetchall()
+    finally:
+        con.close()
+
+
+def drop_fts():
+    """Remove flights_fts so search_flights takes its LIKE fallback."""
+    con = sqlite3.connect(str(db.DB_PATH))
+    con.executescript(
+        """
+        DROP TRIGGER flights_fts_ai;
+        DROP TRIGGER flights_fts_ad;
+        DROP TRIGGER flights_fts_au;
+        DROP TABLE flights_fts;
+        """
+    )
+    con.close()
+
+
+def second_page(q: str, size: int):
+    _, cursor = repositories.search_flights(q, size=size)
+    return lambda: repositories.search_flights(q, size=size, after=cursor)
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--size", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--query", default="SP10")
+    args = parser.parse_args()
+
+    # per-query SQL logging and the fallback warning would dominate the timings
+    logging.getLogger("app.repositories").setLevel(logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        start = time.perf_counter()
+        build_database(path, args.rows)
+        print(f"built {args.rows} rows (with FTS triggers) in {time.perf_counter() - start:.1f}s")
+
+        q, size = args.query, args.size
+        results = {
+            "fts prefix (search_flights)": timed(
+                lambda: repositories.search_flights(q, size=size), args.repeat
+            ),
+            "fts prefix, page 2 (cursor)": timed(second_page(q, size), args.repeat),
+            "LIKE 'q%' scan, unranked": timed(lambda: like_scan(f"{q}%", size), args.repeat),
+            "LIKE '%q%' scan, unranked": timed(lambda: like_scan(f"%{q}%", size), args.repeat),
+            # a rare term forces the LIKE scans to walk the whole table
+            "fts prefix, rare term": timed(
+                lambda: repositories.search_flights("ZZ9", size=size), args.repeat
+            ),
+            "LIKE 'rare%' scan, unranked": timed(lambda: like_scan("ZZ9%", size), args.repeat),
+        }
+
+        drop_fts()
+        results.update({
+            "LIKE fallback (search_flights)": timed(
+                lambda: repositories.search_flights(q, size=size), args.repeat
+            ),
+            "LIKE fallback, page 2 (cursor)": timed(second_page(q, size), args.repeat),
+            "LIKE fallback, rare term": timed(
+                lambda: repositories.search_flights("ZZ9", size=size), args.repeat
+            ),
+        })
+        for name, ms in results.items():
+            print(f"{name:32s} {ms:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
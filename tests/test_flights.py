@@ -36,3 +36,436 @@ def test_create_and_get_flight():
     assert r2.status_code == 200
     data2 = r2.json()
     assert data2["origin"] == "AAA"
+
+
+def test_partitioned_list_merges_across_months(tmp_path, monkeypatch):
+    from app import db, partitions, repositories
+    monkeypatch.setattr(db, "PARTITIONS_DIR", tmp_path / "partitions")
+    monkeypatch.setattr(repositories, "PARTITIONED", True)
+
+    ids = []
+    for number, departure in [
+        ("PRT3", "2025-12-02T10:00:00"),
+        ("PRT1", "2025-10-05T10:00:00"),
+        ("PRT2", "2025-11-20T10:00:00"),
+    ]:
+        r = client.post("/flights/", json={
+            "flight_number": number,
+            "origin": "PRT",
+            "destination": "BBB",
+            "departure_time": departure,
+        })
+        assert r.status_code == 201
+        ids.append(r.json()["flight_id"])
+
+    keys = [p["partition_key"] for p in partitions.list_partitions()]
+    assert keys == ["2025_10", "2025_11", "2025_12"]
+
+    r = client.get("/flights/", params={
+        "origin": "PRT", "sort_by": "departure_time",
+        "size": 2, "page": 1, "fields": "flight_number",
+    })
+    body = r.json()
+    assert body["total"] == 3
+    assert body["items"] == [{"flight_number": "PRT1"}, {"flight_number": "PRT2"}]
+
+    r = client.get("/flights/", params={
+        "origin": "PRT", "departure_from": "2025-11-01", "departure_to": "2025-12-01",
+    })
+    assert [i["flight_number"] for i in r.json()["items"]] == ["PRT2"]
+
+    # moving the departure month moves the flight to another partition
+    r = client.patch(f"/flights/{ids[0]}", json={"departure_time": "2025-10-30T10:00:00"})
+    assert r.status_code == 200
+    assert client.get(f"/flights/{ids[0]}").json()["flight_number"] == "PRT3"
+
+    partitions.archive_before("2025_11", archive_dir=tmp_path / "archive")
+    assert (tmp_path / "archive" / "flights_2025_10.db").exists()
+    assert repositories.get_flight(ids[0]) is None
+
+    # archiving the same month again keeps the earlier archive
+    client.post("/flights/", json={
+        "flight_number": "PRT4", "origin": "PRT", "destination": "BBB",
+        "departure_time": "2025-10-12T10:00:00",
+    })
+    second = partitions.archive_partition("2025_10", archive_dir=tmp_path / "archive")
+    assert second.name == "flights_2025_10.1.db"
+    assert (tmp_path / "archive" / "flights_2025_10.db").exists()
+
+
+def test_hot_flight_index_write_through_and_verify(monkeypatch):
+    from datetime import datetime, timedelta
+    from app import repositories, services
+    from app.hot_flights import HotFlightIndex
+
+    index = HotFlightIndex(enabled=True)
+    monkeypatch.setattr(services, "hot_flights", index)
+
+    soon = (datetime.now() + timedelta(hours=2)).replace(microsecond=0)
+    r = client.post("/flights/", json={
+        "flight_number": "HOT1",
+        "origin": "HHH",
+        "destination": "CCC",
+        "departure_time": soon.isoformat(),
+        "seats_total": 10,
+        "seats_available": 10,
+        "status": "scheduled",
+    })
+    fid = r.json()["flight_id"]
+    assert index.get(fid)["flight_number"] == "HOT1"
+
+    r = client.post(f"/flights/{fid}/register", json={
+        "changed_by": "tester", "seats_available_delta": -3,
+    })
+    assert r.json()["seats_available"] == 7
+    assert client.get(f"/flights/{fid}/availability").json()["seats_available"] == 7
+
+    filters = {
+        "origin": "HHH", "destination": "CCC",
+        "departure_from": datetime.now().isoformat(),
+        "departure_to": (datetime.now() + timedelta(hours=24)).isoformat(),
+    }
+    assert index.covers(filters)
+    rows, total = index.list_flights(1, 20, filters, "departure_time", "asc", "flight_id")
+    assert (rows, total) == ([{"flight_id": fid}], 1)
+
+    assert index.verify()["mismatched"] == []
+    # a write that bypasses the service is detected and repaired
+    repositories.update_flight(fid, {"seats_available": 1})
+    assert index.verify()["mismatched"] == [fid]
+    assert index.seats_available(fid) == 1
+
+
+def test_startup_fast_path_and_readiness():
+    from app import startup
+
+    # schema is already at SCHEMA_VERSION, so the DDL is skipped
+    assert init_db() is False
+    startup.run_startup(background=False)
+
+    r = client.get("/health/ready")
+    assert r.status_code == 200
+    body = r.json()
+    assert body["ready"] and body["schema_migrated"] is False
+    assert body["first_request_s"] is not None
+    assert client.get("/health/live").status_code == 200
+
+
+def test_admission_rejects_expensive_listings(monkeypatch):
+    from app import admission as admission_module
+    from app.admission import AdmissionController
+
+    controller = AdmissionController(
+        enabled=True, capacity=40, refill_per_sec=1, client_header="X-Client-Id"
+    )
+    monkeypatch.setattr(admission_module, "admission", controller)
+
+    fid = client.post("/flights/", json={
+        "flight_number": "ADM1", "origin": "ADM", "destination": "BBB",
+    }).json()["flight_id"]
+
+    heavy = {"size": 200, "sort_by": "aircraft_type"}
+    headers = {"X-Client-Id": "greedy"}
+    assert client.get("/flights/", params=heavy, headers=headers).status_code == 200
+    r = client.get("/flights/", params=heavy, headers=headers)
+    assert r.status_code == 429
+    assert int(r.headers["Retry-After"]) >= 1
+
+    # other clients and single-flight reads are unaffected
+    assert client.get("/flights/", params=heavy, headers={"X-Client-Id": "other"}).status_code == 200
+    assert client.get(f"/flights/{fid}").status_code == 200
+
+    metrics = controller.metrics()
+    assert metrics["rejected_rate_limited"] == 1
+    assert metrics["admitted_heavy"] == 2
+    assert metrics["heavy_in_flight"] == 0
+
+
+def test_search_prefix_with_keyset_pagination():
+    for number, aircraft in [("SRC1001", "A321"), ("SRC1002", "B737"), ("SRC2001", "A321")]:
+        client.post("/flights/", json={
+            "flight_number": number,
+            "origin": "SRA",
+            "destination": "SRB",
+            "aircraft_type": aircraft,
+        })
+
+    r = client.get("/flights/search", params={"q": "SRC10", "size": 1, "fields": "flight_number"})
+    assert r.status_code == 200
+    first = r.json()
+    assert first["items"] == [{"flight_number": "SRC1001"}]
+
+    r = client.get("/flights/search", params={
+        "q": "SRC10", "size": 1, "fields": "flight_number", "after": first["next_cursor"],
+    })
+    assert r.json()["items"] == [{"flight_number": "SRC1002"}]
+
+    # the index follows updates through the triggers
+    fid = client.get("/flights/search", params={"q": "SRC2001"}).json()["items"][0]["flight_id"]
+    client.patch(f"/flights/{fid}", json={"flight_number": "SRX9"})
+    r = client.get("/flights/search", params={"q": "SRC A321"})
+    assert [i["flight_number"] for i in r.json()["items"]] == ["SRC1001"]
+
+    assert client.get("/flights/search", params={"q": "!!"}).status_code == 400
+
+    # flight_number prefix hits rank above route hits, regardless of id
+    client.post("/flights/", json={"flight_number": "ZZ1", "origin": "SRQ", "destination": "BBB"})
+    client.post("/flights/", json={"flight_number": "SRQ1", "origin": "AAA", "destination": "BBB"})
+    r = client.get("/flights/search", params={"q": "srq", "fields": "flight_number"})
+    assert r.json()["items"] == [{"flight_number": "SRQ1"}, {"flight_number": "ZZ1"}]
+
+
+def test_departure_range_same_day_bounds():
+    r = client.post("/flights/", json={
+        "flight_number": "RNG1",
+        "origin": "RNG",
+        "destination": "BBB",
+        "departure_time": "2025-11-20T10:00:00",
+    })
+    assert r.status_code == 201
+
+    def total(**bounds):
+        return client.get("/flights/", params={"origin": "RNG", **bounds}).json()["total"]
+
+    assert total(departure_from="2025-11-20T09:00:00") == 1
+    assert total(departure_from="2025-11-20 09:00:00") == 1
+    assert total(departure_from="2025-11-20T10:30:00") == 0
+    assert total(departure_to="2025-11-20T09:30:00") == 0
+    assert total(departure_to="2025-11-20T10:00:01") == 1
+
+
+def test_migrate_main_table_into_partitions(tmp_path, monkeypatch):
+    from app import db, partitions, repositories
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "flights.db")
+    init_db()
+
+    r = client.post("/flights/", json={
+        "flight_number": "MIG1",
+        "origin": "MIG",
+        "destination": "BBB",
+        "departure_time": "2024-03-05T08:00:00",
+    })
+    fid = r.json()["flight_id"]
+    client.post(f"/flights/{fid}/register", json={"changed_by": "tester", "new_status": "boarding"})
+
+    monkeypatch.setattr(db, "PARTITIONS_DIR", tmp_path / "partitions")
+    assert partitions.migrate_main_table(batch_size=2) == 1
+    assert not partitions.main_table_has_flights()
+
+    monkeypatch.setattr(repositories, "PARTITIONED", True)
+    flight = repositories.get_flight(fid)
+    assert flight["flight_number"] == "MIG1" and flight["status"] == "boarding"
+
+    con = db.get_partition_connection("2024_03")
+    try:
+        logs = con.execute("SELECT COUNT(*) FROM flight_logs WHERE flight_id = ?", (fid,)).fetchone()[0]
+    finally:
+        con.close()
+    assert logs == 1
+
+
+def test_hot_flight_reload_keeps_concurrent_writes(monkeypatch):
+    import threading
+    import time
+    from datetime import datetime, timedelta
+    from app import repositories, services
+    from app.hot_flights import HotFlightIndex
+
+    index = HotFlightIndex(enabled=True)
+    monkeypatch.setattr(services, "hot_flights", index)
+
+    soon = (datetime.now() + timedelta(hours=1)).replace(microsecond=0)
+    fid = client.post("/flights/", json={
+        "flight_number": "HOT2",
+        "origin": "HHH",
+        "destination": "DDD",
+        "departure_time": soon.isoformat(),
+        "seats_available": 10,
+    }).json()["flight_id"]
+    index.load()
+
+    original_iter = repositories.iter_flights_departing
+    writer = threading.Thread(
+        target=services.FlightService.update_flight, args=(fid, {"seats_available": 3})
+    )
+
+    def slow_iter(*args, **kwargs):
+        stale = list(original_iter(*args, **kwargs))
+        # a write-through arrives after the snapshot was read
+        writer.start()
+        time.sleep(0.2)
+        yield from stale
+
+    monkeypatch.setattr(repositories, "iter_flights_departing", slow_iter)
+    index.load()
+    writer.join()
+    assert index.seats_available(fid) == 3
+
+
+def test_register_delta_ignores_stale_cache(monkeypatch):
+    from datetime import datetime, timedelta
+    from app import repositories, services
+    from app.hot_flights import HotFlightIndex
+
+    index = HotFlightIndex(enabled=True)
+    monkeypatch.setattr(services, "hot_flights", index)
+
+    soon = (datetime.now() + timedelta(hours=1)).replace(microsecond=0)
+    fid = client.post("/flights/", json={
+        "flight_number": "HOT3",
+        "origin": "HHH",
+        "destination": "EEE",
+        "departure_time": soon.isoformat(),
+        "seats_available": 10,
+    }).json()["flight_id"]
+    index.load()
+
+    # another worker books 4 seats; this worker's cache still says 10
+    repositories.update_flight(fid, {}, {"seats_available": -4})
+    assert index.seats_available(fid) == 10
+
+    r = client.post(f"/flights/{fid}/register", json={
+        "changed_by": "tester", "seats_available_delta": -1,
+    })
+    assert r.json()["seats_available"] == 5
+    assert index.seats_available(fid) == 5
+
+
+def test_admission_ignores_untrusted_client_header(monkeypatch):
+    from app import admission as admission_module
+    from app.admission import AdmissionController
+
+    controller = AdmissionController(enabled=True, capacity=40, refill_per_sec=1)
+    monkeypatch.setattr(admission_module, "admission", controller)
+
+    heavy = {"size": 200, "sort_by": "aircraft_type"}
+    statuses = [
+        client.get("/flights/", params=heavy, headers={"X-Client-Id": f"spoof{i}"}).status_code
+        for i in range(3)
+    ]
+    assert statuses == [200, 429, 429]
+
+
+def test_admission_rejects_when_heavy_slots_are_busy():
+    import asyncio
+    import pytest
+    from fastapi import HTTPException
+    from app.admission import AdmissionController
+
+    controller = AdmissionController(enabled=True, heavy_concurrency=1, queue_timeout=0.05)
+
+    async def scenario():
+        assert await controller.admit("a", 20) is True
+        with pytest.raises(HTTPException) as exc:
+            await controller.admit("b", 20)
+        assert exc.value.status_code == 429
+        assert exc.value.headers["Retry-After"] == "1"
+        # the rejected request's charge is refunded
+        assert controller._buckets["b"].tokens == controller.capacity
+        controller.release()
+        assert await controller.admit("b", 20) is True
+        controller.release()
+
+    asyncio.run(scenario())
+    metrics = controller.metrics()
+    assert metrics["rejected_overloaded"] == 1
+    assert metrics["queued"] == 0 and metrics["heavy_in_flight"] == 0
+
+
+def test_search_has_its_own_admission_cost():
+    from app.admission import HEAVY_COST, estimate_cost, estimate_search_cost
+
+    listing = estimate_cost(page=1, size=20, sort_by="flight_id", filters={}, fields=None)
+    assert estimate_search_cost("SP10", 20, None) > listing
+    # short prefixes match (and rank) most of the table
+    assert estimate_search_cost("S", 20, None) >= HEAVY_COST
+    assert estimate_search_cost("S", 20, None) > estimate_search_cost("SP10", 20, None)
+
+
+def test_partition_key_uses_utc_for_offset_departures(tmp_path, monkeypatch):
+    from app import db, partitions, repositories
+    monkeypatch.setattr(db, "PARTITIONS_DIR", tmp_path / "partitions")
+
+    assert partitions.partition_key_for("2025-11-01 01:00:00+03:30") == "2025_10"
+
+    monkeypatch.setattr(repositories, "PARTITIONED", True)
+    client.post("/flights/", json={
+        "flight_number": "UTC1", "origin": "UTC", "destination": "BBB",
+        "departure_time": "2025-11-01T01:00:00+03:30",
+    })
+    r = client.get("/flights/", params={
+        "origin": "UTC",
+        "departure_from": "2025-10-31T20:00:00",
+        "departure_to": "2025-10-31T23:00:00",
+    })
+    assert [i["flight_number"] for i in r.json()["items"]] == ["UTC1"]
+
+
+def test_hot_flight_index_matches_db_for_offset_departures():
+    from datetime import datetime
+    from app import repositories
+    from app.hot_flights import HotFlightIndex
+
+    client.post("/flights/", json={
+        "flight_number": "OFF1", "origin": "OFF", "destination": "BBB",
+        "departure_time": "2030-05-10T10:00:00+03:00",
+    })
+    index = HotFlightIndex(enabled=True)
+    index.load(now=datetime(2030, 5, 10))
+
+    for low, high in (("06:00", "08:00"), ("09:00", "11:00")):
+        filters = {
+            "origin": "OFF",
+            "departure_from": f"2030-05-10T{low}:00",
+            "departure_to": f"2030-05-10T{high}:00",
+        }
+        assert index.covers(filters)
+        cached = index.list_flights(1, 20, filters, "flight_id", "asc", "flight_number")
+        stored = repositories.list_flights(
+            page=1, size=20, filters=filters, sort_by="flight_id", fields="flight_number"
+        )
+        assert cached == stored
+    # 10:00+03:00 departs at 07:00 UTC
+    assert cached == ([], 0)
+
+
+def test_sample_load_keeps_flights_created_meanwhile(tmp_path, monkeypatch):
+    import json
+    from app import db, repositories, sample_data_loader
+
+    sample = tmp_path / "sample.json"
+
+    def load_over(fid):
+        sample.write_text(json.dumps([{
+            "flight_id": fid, "flight_number": "SAMPLE", "origin": "SMP",
+            "destination": "BBB", "departure_time": "2025-11-05T18:00:00",
+        }]))
+        sample_data_loader.load_sample(sample)
+        return repositories.get_flight(fid)["flight_number"]
+
+    fid = client.post("/flights/", json={
+        "flight_number": "LIVE1", "origin": "SMP", "destination": "BBB",
+        "departure_time": "2025-11-05T18:00:00",
+    }).json()["flight_id"]
+    assert load_over(fid) == "LIVE1"
+
+    monkeypatch.setattr(db, "PARTITIONS_DIR", tmp_path / "partitions")
+    monkeypatch.setattr(repositories, "PARTITIONED", True)
+    monkeypatch.setattr(sample_data_loader, "PARTITIONED", True)
+    fid = client.post("/flights/", json={
+        "flight_number": "LIVE2", "origin": "SMP", "destination": "BBB",
+        "departure_time": "2025-11-05T18:00:00",
+    }).json()["flight_id"]
+    assert load_over(fid) == "LIVE2"
+
+
+def test_health_probes_are_not_the_first_request(monkeypatch):
+    from app import startup
+
+    monkeypatch.setattr(startup, "state", startup.StartupState())
+    fresh = TestClient(startup.FirstRequestMiddleware(app))
+
+    assert fresh.get("/health/live").status_code == 200
+    assert startup.state.first_request_at is None
+    fresh.get("/flights/", params={"size": 1})
+    assert startup.state.first_request_at is not None